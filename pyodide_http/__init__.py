@@ -17,6 +17,9 @@ __version__ = "0.2.3"
 @dataclass
 class Options:
     with_credentials: bool = False
+    # size of the SharedArrayBuffer used to hand streamed bytes over from the fetch worker.
+    # bigger means fewer worker round trips per response, keep it a multiple of the 64KiB wasm page size
+    stream_buffer_size: int = 4 * 1024 * 1024
 
 
 _options = Options()
@@ -27,6 +30,13 @@ def set_with_credentials_option(value: bool):
     _options.with_credentials = value
 
 
+def set_stream_buffer_size_option(value: int):
+    if value <= 0 or value % 65536 != 0:
+        raise ValueError("stream_buffer_size must be a positive multiple of 64KiB")
+    global _options
+    _options.stream_buffer_size = value
+
+
 class option_context(ContextDecorator):
     def __init__(self, with_credentials=False):
         self._with_credentials = with_credentials
@@ -38,6 +48,7 @@ class option_context(ContextDecorator):
 
         _options = Options()
         _options.with_credentials = self._with_credentials
+        _options.stream_buffer_size = self._default_options.stream_buffer_size
 
     def __exit__(self, *_):
         if self._default_options is not None:
@@ -72,6 +83,17 @@ def patch_urllib(continue_on_import_error: bool = False):
         patch()
 
 
+async def urlopen_async(url, data=None):
+    """
+    urllib.request.urlopen, but awaits the fetch instead of blocking on it,
+    so it can be used to run several requests concurrently from asyncio code.
+    Takes a url string or urllib.request.Request, and optionally the data to POST.
+    """
+    from ._urllib import urlopen_async as _urlopen_async
+
+    return await _urlopen_async(url, data)
+
+
 def should_patch():
     return _SHOULD_PATCH
 
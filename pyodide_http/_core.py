@@ -1,13 +1,21 @@
 import json
 from dataclasses import dataclass, field
-from typing import Optional, Dict
-from email.parser import Parser
+from http.client import HTTPMessage
+from typing import Iterable, Optional, Dict
 from pyodide.ffi import to_js, run_sync
+from js import XMLHttpRequest, URLSearchParams, console, fetch, AbortSignal, Object
+
+try:
+    from pyodide.ffi import can_run_sync
+except ImportError:
+    # older pyodide has no way to tell whether stack switching is available, so stick to XHR
+    def can_run_sync():
+        return False
 
 from . import _options
 
 # need to import streaming here so that the web-worker is setup
-from ._streaming import send_streaming_request
+from ._streaming import send_streaming_request, _IN_WORKER
 # import ._streaming
 
 """
@@ -16,6 +24,13 @@ See also https://github.com/koenvo/pyodide-http/issues/22
 """
 HEADERS_TO_IGNORE = ("user-agent",)
 
+# the browser doesnt let you set these
+_BLOCKED_HEADERS = frozenset({"sec-fetch-mode", "accept-encoding", "origin", "referer", "user-agent", "cookie", "cookie2"})
+# we cant directly set cookie headers, but we can ask the browser to include credentials if yt-dlp wishes to set them
+_CREDENTIALS_HEADERS = frozenset({"cookie", "cookie2"})
+# these headers cannot be modified directly, but they are needed, so requests are proxied through a content script
+_PROXY_HEADERS = frozenset({"origin"})
+
 
 class _RequestError(Exception):
     def __init__(self, message=None, *, request=None, response=None):
@@ -53,12 +68,61 @@ class Request:
         self.set_body(json.dumps(body).encode("utf-8"))
 
 
-@dataclass
 class Response:
-    status_code: int
-    headers: Dict[str, str]
-    body: bytes
-    stream: bool = False
+    def __init__(
+        self,
+        status_code: int,
+        headers: Optional[HTTPMessage] = None,
+        body: bytes = b"",
+        stream: bool = False,
+        raw_headers: str = "",
+    ):
+        self.status_code = status_code
+        # either already parsed headers, or a raw header string (XHR fallback, older proxy_fetch versions)
+        # which is only parsed when headers is first used
+        self._headers = headers
+        self._raw_headers = raw_headers
+        self.body = body
+        self.stream = stream
+
+    @property
+    def headers(self) -> HTTPMessage:
+        if self._headers is None:
+            self._headers = _parse_http_headers(self._raw_headers)
+        return self._headers
+
+    @headers.setter
+    def headers(self, value: HTTPMessage):
+        self._headers = value
+
+    def __repr__(self):
+        # don't force a parse just to print the response
+        if self._headers is None:
+            headers = f"<unparsed {len(self._raw_headers)} chars>"
+        else:
+            headers = repr(dict(self._headers.items()))
+        return f"Response(status_code={self.status_code!r}, headers={headers}, stream={self.stream!r})"
+
+
+def _headers_from_pairs(pairs: Iterable) -> HTTPMessage:
+    # headers stay an HTTPMessage from here on, so urllib can hand them to HTTPResponse as they are
+    msg = HTTPMessage()
+    for key, value in pairs:
+        msg[key] = value
+    return msg
+
+
+def _parse_http_headers(raw: str) -> HTTPMessage:
+    # getAllResponseHeaders gives flat "name: value" lines, no need for the (slow) email parser.
+    # names are lowercased, same as what fetch hands back
+    msg = HTTPMessage()
+    for line in raw.splitlines():
+        if not line:
+            continue
+        key, sep, value = line.partition(":")
+        if sep:
+            msg[key.strip().lower()] = value.strip()
+    return msg
 
 
 _SHOWN_WARNING = False
@@ -68,30 +132,22 @@ def show_streaming_warning():
     global _SHOWN_WARNING
     if not _SHOWN_WARNING:
         _SHOWN_WARNING = True
-        from js import console
-
         console.warn(
             "requests can't stream data in the main thread, using non-streaming fallback"
         )
 
 
-def orig_send(request: Request, stream: bool = False, withCredentials: bool | None = None) -> Response:
+def _apply_params(request: Request):
     if request.params:
-        from js import URLSearchParams
-
         params = URLSearchParams.new()
         for k, v in request.params.items():
             params.append(k, v)
         request.url += "?" + params.toString()
 
-    from js import XMLHttpRequest
 
-    try:
-        from js import importScripts
+def orig_send(request: Request, stream: bool = False, withCredentials: bool | None = None) -> Response:
+    _apply_params(request)
 
-        _IN_WORKER = True
-    except ImportError:
-        _IN_WORKER = False
     # support for streaming workers (in worker )
     if stream:
         if not _IN_WORKER:
@@ -99,16 +155,51 @@ def orig_send(request: Request, stream: bool = False, withCredentials: bool | No
             show_streaming_warning()
         else:
             result = send_streaming_request(request, withCredentials)
-            if result == False:
-                stream = False
-                print("FALLING BACK TO NON STREAMING UH OH")
-            else:
-                newh = {}
-                for [key, val] in result.headers:
-                    newh[key] = val
-                result.headers = newh
+            # False means streaming isn't available in this page, _streaming already warned about it once
+            if result is not False:
                 return result
 
+    if can_run_sync():
+        return _fetch_send(request, withCredentials)
+    return _xhr_send(request, withCredentials)
+
+
+def _request_body(request: Request):
+    body = request.body
+    if hasattr(body, 'read'):
+        body = body.read()
+    # fetch refuses an empty body on GET/HEAD, XHR silently ignored it
+    return body or None
+
+
+async def _fetch_send_async(request: Request, withCredentials: bool | None = None) -> Response:
+    with_credentials = _options.with_credentials if withCredentials is None else withCredentials
+    init = {
+        "method": request.method,
+        "headers": {
+            name: value for name, value in request.headers.items() if name.lower() not in HEADERS_TO_IGNORE
+        },
+        "body": _request_body(request),
+        # matches XHR semantics, where withCredentials = false still sends same-origin credentials
+        "credentials": "include" if with_credentials else "same-origin",
+    }
+    if request.timeout != 0:
+        init["signal"] = AbortSignal.timeout(int(request.timeout * 1000))
+
+    # the body arrives as an ArrayBuffer so no text re-encoding is needed
+    js_response = await fetch(request.url, to_js(init, dict_converter=Object.fromEntries))
+    body = (await js_response.arrayBuffer()).to_bytes()
+    headers = _headers_from_pairs(js_response.headers.entries())
+
+    return Response(status_code=js_response.status, headers=headers, body=body)
+
+
+def _fetch_send(request: Request, withCredentials: bool | None = None) -> Response:
+    # block until the async fetch is done
+    return run_sync(_fetch_send_async(request, withCredentials))
+
+
+def _xhr_send(request: Request, withCredentials: bool | None = None) -> Response:
     xhr = XMLHttpRequest.new()
     # set timeout only if pyodide is in a worker, because
     # there is a warning not to set timeout on synchronous main thread
@@ -116,6 +207,8 @@ def orig_send(request: Request, stream: bool = False, withCredentials: bool | No
     if _IN_WORKER and request.timeout != 0:
         xhr.timeout = int(request.timeout * 1000)
 
+    # synchronous XHR on the main thread can't return an arraybuffer, so smuggle the bytes through a
+    # single-byte charset instead
     if _IN_WORKER:
         xhr.responseType = "arraybuffer"
     else:
@@ -126,26 +219,21 @@ def orig_send(request: Request, stream: bool = False, withCredentials: bool | No
         if name.lower() not in HEADERS_TO_IGNORE:
             xhr.setRequestHeader(name, value)
 
-    body = request.body
-
-    if hasattr(body, 'read'):
-        body = body.read()
-
     xhr.withCredentials = _options.with_credentials if withCredentials is None else withCredentials
-    xhr.send(to_js(body))
+    xhr.send(to_js(_request_body(request)))
 
-    headers = dict(Parser().parsestr(xhr.getAllResponseHeaders()))
+    raw_headers = xhr.getAllResponseHeaders()
 
     if _IN_WORKER:
         body = xhr.response.to_py().tobytes()
     else:
         body = xhr.response.encode("ISO-8859-15")
 
-    return Response(status_code=xhr.status, headers=headers, body=body)
+    return Response(status_code=xhr.status, raw_headers=raw_headers, body=body)
 
 
-def dlpro_proxy_send(request: Request, credentials: bool = False):
-    from js import proxy_fetch, Object
+async def _dlpro_proxy_send_async(request: Request, credentials: bool = False) -> Response:
+    from js import proxy_fetch
     # pyodide wont convert custom objects by default, so parse them out
     jsified_request = {
         "method": request.method,
@@ -160,49 +248,54 @@ def dlpro_proxy_send(request: Request, credentials: bool = False):
     #  but setting cookies is a hard and janky process
     # print(current_cookies)
     # oldcookies = run_sync(force_cookies(to_js(chromeify_cookies(current_cookies), dict_converter=Object.fromEntries)))
-    # block until async js request is done
-    js_response = run_sync(proxy_fetch(to_js(jsified_request, dict_converter=Object.fromEntries)))
+    js_response = await proxy_fetch(to_js(jsified_request, dict_converter=Object.fromEntries))
 
     # run_sync(force_cookies(oldcookies))
-    # idfk, ripped from pyodide
-    headers = dict(Parser().parsestr(js_response["headers"]))
+    js_headers = js_response["headers"]
     # expected response object
+    if isinstance(js_headers, str):
+        # older proxy_fetch versions hand back the raw header string, parse it only if it gets used
+        return Response(
+            status_code=js_response["status_code"],
+            raw_headers=js_headers,
+            body=js_response["body"]
+        )
+    # newer ones hand back [...response.headers.entries()], so no parsing is needed
     return Response(
         status_code=js_response["status_code"],
-        headers=headers,
+        headers=_headers_from_pairs(js_headers.to_py()),
         body=js_response["body"]
     )
 
 
+def dlpro_proxy_send(request: Request, credentials: bool = False) -> Response:
+    # block until async js request is done
+    return run_sync(_dlpro_proxy_send_async(request, credentials))
+
+
+def _filter_headers(request: Request) -> tuple[bool, bool]:
+    """
+    Strip the headers the browser won't let us set from request, returns (proxy, credentials), telling whether
+    the request needs to go through the content script proxy and whether to include credentials
+    """
+    blocked = {header.lower() for header in request.headers} & _BLOCKED_HEADERS
+    if not blocked:
+        # nothing to strip, and proxy/credentials headers are all blocked ones
+        return False, False
+    # dont add headers that are not allowed
+    request.headers = {
+        header: value for header, value in request.headers.items() if header.lower() not in blocked
+    }
+    # signal we need to proxy this request, and/or include credentials
+    return not blocked.isdisjoint(_PROXY_HEADERS), not blocked.isdisjoint(_CREDENTIALS_HEADERS)
+
+
 # major patch
 def send(request: Request, stream: bool = False):
     # from js import console, Object
     # console.log(to_js(request.headers, dict_converter=Object.fromEntries))
     # print(request)
-    proxy = False
-    credentials = False
-    # the browser doesnt let you set these
-    blocked_headers = ['sec-fetch-mode', 'accept-encoding', "origin", "referer", "user-agent", "cookie", "cookie2"]
-    # we cant directly set cookie headers, but we can ask the browser to include credentials if yt-dlp wishes to set them
-    credentials_headers = ["cookie", "cookie2"]
-    # these headers cannot be modified directly, but they are needed, so requests are proxied through a content script
-    proxy_headers = ["origin"]
-    # handle headers
-    new_headers = {}
-    for header, value in request.headers.items():
-        # dont add headers that are not allowed
-        if header.lower() in blocked_headers:
-            # print("Blocked header:", header, value)
-            # signal we need to proxy this request
-            if header.lower() in proxy_headers:
-                proxy = True
-            # signal we need to include credentials
-            if header.lower() in credentials_headers:
-                credentials = True
-        else:
-            # print("Allowed header:", header, value)
-            new_headers[header] = value
-    request.headers = new_headers
+    proxy, credentials = _filter_headers(request)
     # print(request)
     if proxy:
         if stream:
@@ -215,3 +308,15 @@ def send(request: Request, stream: bool = False):
         # try:
         #     nonlocal out
         return orig_send(request, True, credentials)
+
+
+async def send_async(request: Request) -> Response:
+    """
+    Same as send, but awaits the fetch instead of blocking on it, so requests can run concurrently.
+    Streaming needs the blocking worker handoff, so responses here are always fully buffered.
+    """
+    proxy, credentials = _filter_headers(request)
+    if proxy:
+        return await _dlpro_proxy_send_async(request, credentials)
+    _apply_params(request)
+    return await _fetch_send_async(request, credentials)
@@ -61,7 +61,7 @@ class PyodideHTTPAdapter(BaseAdapter):
         # Fallback to None if there's no status_code, for whatever reason.
         response.status_code = getattr(resp, "status_code", None)
         # Make headers case-insensitive.
-        response.headers = CaseInsensitiveDict(resp.headers)
+        response.headers = CaseInsensitiveDict(resp.headers.items())
         # Set encoding.
         response.encoding = get_encoding_from_headers(response.headers)
         if isinstance(resp.body, IOBase):
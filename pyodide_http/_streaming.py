@@ -17,17 +17,20 @@ You can tell if cross origin isolation is successfully enabled by looking at the
 javascript console. If it isn't, requests with stream set to True will fallback to XMLHttpRequest, i.e. getting the whole
 request into a buffer and then returning it. it shows a warning in the javascript console in this case.
 """
-import asyncio
 import io
 import json
-import time
-import traceback
 
 import js
-from js import SharedArrayBuffer
 from pyodide.ffi import to_js
 from urllib.request import Request
 
+try:
+    from js import importScripts
+
+    _IN_WORKER = True
+except ImportError:
+    _IN_WORKER = False
+
 SUCCESS_HEADER = -1
 SUCCESS_EOF = -2
 ERROR_TIMEOUT = -3
@@ -47,6 +50,8 @@ class _ReadStream(io.RawIOBase):
         self.connection_id = connection_id
         self.worker = worker
         self.timeout = int(1000 * timeout) if timeout > 0 else None
+        # whether a getMore has been posted that we haven't waited on yet
+        self._pending = False
 
     def __del__(self):
         self.worker.postMessage(_obj_from_dict({"close": self.connection_id}))
@@ -60,17 +65,24 @@ class _ReadStream(io.RawIOBase):
     def seekable(self) -> bool:
         return False
 
+    def _request_more(self):
+        # ask the worker for the next chunk, it fills the shared buffer and sets the length in int_buffer[0]
+        js.Atomics.store(self.int_buffer, 0, 0)
+        self.worker.postMessage(_obj_from_dict({"getMore": self.connection_id}))
+        self._pending = True
+
     def readinto(self, byte_obj) -> bool:
         if not self.int_buffer:
             return 0
         if self.read_len == 0:
-            # wait for the worker to send something
-            js.Atomics.store(self.int_buffer, 0, 0)
-            self.worker.postMessage(_obj_from_dict({"getMore": self.connection_id}))
+            if not self._pending:
+                self._request_more()
+            # wait for the worker to send something, if the prefetched chunk already landed this returns at once
             if js.Atomics.wait(self.int_buffer, 0, 0, self.timeout) == "timed-out":
                 from ._core import _StreamingTimeout
 
                 raise _StreamingTimeout
+            self._pending = False
             data_len = self.int_buffer[0]
             if data_len > 0:
                 self.read_len = data_len
@@ -93,6 +105,10 @@ class _ReadStream(io.RawIOBase):
         )
         self.read_len -= ret_length
         self.read_pos += ret_length
+        if self.read_len == 0:
+            # the chunk has been copied out, so the shared buffer is free again. have the worker fetch the next
+            # one now, while the caller is busy with this one
+            self._request_more()
         return ret_length
 
 
@@ -104,22 +120,40 @@ class _StreamingFetcher:
         self._worker = run_sync(js.spawn_worker())
 
     def send(self, request, credentials: bool):
-        from ._core import Response
+        from ._core import Response, _request_body, _headers_from_pairs
+        # imported here rather than at module level, option_context swaps in a new options object
+        from . import _options
+
+        buffer_size = _options.stream_buffer_size
 
         headers = request.headers
-        body = request.body
-        fetch_data = {"headers": headers, "body": to_js(body), "method": request.method,
+        body = _request_body(request)
+        transfer = []
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            # copy the body out of the wasm heap once, into an ArrayBuffer we own, and transfer that to the
+            # worker instead of letting postMessage structured-clone a second copy
+            # view it as bytes, len() of a memoryview counts items, not bytes
+            raw_body = memoryview(body).cast("B")
+            js_body = js.Uint8Array.new(len(raw_body))
+            js_body.assign(raw_body)
+            transfer.append(js_body.buffer)
+        else:
+            js_body = to_js(body)
+        fetch_data = {"headers": headers, "body": js_body, "method": request.method,
                       # send credentials if desired
                       "credentials": "include" if credentials else "omit"}
         # start the request off in the worker
         timeout = int(1000 * request.timeout) if request.timeout > 0 else None
-        shared_buffer = js.SharedArrayBuffer.new(1048576)
+        shared_buffer = js.SharedArrayBuffer.new(buffer_size)
         int_buffer = js.Int32Array.new(shared_buffer)
         byte_buffer = js.Uint8Array.new(shared_buffer, 8)
 
         js.Atomics.store(int_buffer, 0, 0)
         js.Atomics.notify(int_buffer, 0)
-        absolute_url = js.URL.new(request.url, js.location).href
+        if request.url.startswith(("http://", "https://")):
+            absolute_url = request.url
+        else:
+            absolute_url = js.URL.new(request.url, js.location).href
         # js.console.log(
         #     _obj_from_dict(
         #         {
@@ -137,6 +171,7 @@ class _StreamingFetcher:
                     "fetchParams": fetch_data,
                 }
             ),
+            to_js(transfer),
         )
 
         # print(self._worker)
@@ -154,16 +189,14 @@ class _StreamingFetcher:
             # got response
             # header length is in second int of intBuffer
             string_len = int_buffer[1]
-            # decode the rest to a JSON string
-            decoder = js.TextDecoder.new()
-            # this does a copy (the slice) because decode can't work on shared array
-            # for some silly reason
-            json_str = decoder.decode(byte_buffer.slice(0, string_len))
+            # copy the utf-8 JSON straight out of the shared buffer into python bytes. TextDecoder can't
+            # read shared memory, so going through it needs an extra slice copy plus a JS string
+            json_bytes = byte_buffer.subarray(0, string_len).to_bytes()
             # get it as an object
-            response_obj = json.loads(json_str)
+            response_obj = json.loads(json_bytes)
             return Response(
                 status_code=response_obj["status"],
-                headers=response_obj["headers"],
+                headers=_headers_from_pairs(response_obj["headers"]),
                 body=io.BufferedReader(
                     _ReadStream(
                         int_buffer,
@@ -172,15 +205,15 @@ class _StreamingFetcher:
                         self._worker,
                         response_obj["connectionID"],
                     ),
-                    buffer_size=1048576,
+                    # the first 8 bytes of the shared buffer hold the status ints
+                    buffer_size=buffer_size - 8,
                 ),
                 stream=True
             )
         if int_buffer[0] == ERROR_EXCEPTION:
             string_len = int_buffer[1]
             # decode the error string
-            decoder = js.TextDecoder.new()
-            json_str = decoder.decode(byte_buffer.slice(0, string_len))
+            json_str = byte_buffer.subarray(0, string_len).to_bytes().decode("utf-8", "replace")
             from ._core import _StreamingError
 
             raise _StreamingError(
@@ -188,14 +221,29 @@ class _StreamingFetcher:
             )
 
 
-if SharedArrayBuffer:
+# browsers only define SharedArrayBuffer on cross origin isolated pages (and older ones define it without it being
+# shareable with workers), so probe both without importing, importing a missing global raises ImportError
+SharedArrayBuffer = getattr(js, "SharedArrayBuffer", None)
+_CROSS_ORIGIN_ISOLATED = bool(getattr(js, "crossOriginIsolated", False))
+
+# streaming only ever happens from a worker (the main thread can't Atomics.wait). check all of it up front so we
+# don't pay for spawning a worker that can never be used
+if _IN_WORKER and SharedArrayBuffer and _CROSS_ORIGIN_ISOLATED:
     _fetcher = _StreamingFetcher()
 else:
     _fetcher = None
+    if _IN_WORKER and not _CROSS_ORIGIN_ISOLATED:
+        js.console.warn(
+            "The page is not crossOriginIsolated, so SharedArrayBuffer can't be used and streaming requests will "
+            "fall back to non-streaming. Serve the page with 'Cross-Origin-Opener-Policy: same-origin' and "
+            "'Cross-Origin-Embedder-Policy: require-corp' to enable streaming."
+        )
 
 
 def send_streaming_request(request: Request, credentials: bool):
     # global _fetcher
     # if _fetcher is None:
     #     _fetcher = _StreamingFetcher()
+    if _fetcher is None:
+        return False
     return _fetcher.send(request, credentials)
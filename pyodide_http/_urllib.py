@@ -1,91 +1,55 @@
-import sys
-import traceback
 from io import BytesIO
 
 import urllib.request
 import urllib.error
-from http.client import HTTPResponse
+from http.client import HTTPResponse, HTTPMessage, responses
 
-from ._core import Request, send
+from ._core import Request, send, send_async
 
 _IS_PATCHED = False
 
-import io
-
 
+# fake socket, HTTPResponse reads the body from whatever file object makefile returns
 class FakeSock:
-    def __init__(self, data):
-        self.data = data
+    def __init__(self, fp):
+        self.fp = fp
 
     def makefile(self, mode):
-        return BytesIO(self.data)
-
+        return self.fp
+
+
+def _prebuilt_response(sock, status: int, msg: HTTPMessage, length: int | None) -> HTTPResponse:
+    # fill in what HTTPResponse.begin() would have, without serializing the headers just to parse them again
+    response = HTTPResponse(sock)
+    response.code = response.status = status
+    response.reason = responses.get(status, "")
+    response.version = 11
+    response.headers = response.msg = msg
+    response.chunked = False
+    response.length = length
+    response.will_close = True
+    return response
 
-# fake socket that supports streaming
-class StreamSock:
-    def __init__(self, header, body):
-        self.stream = PrefixedReader(header, body)
 
-    def makefile(self, mode):
-        return self.stream
-
-
-# prepends a constant byte string to a dynamic stream and returns a new stream. this is to add the http headers to
-#  streams
-class PrefixedReader(io.RawIOBase):
-    def __init__(self, prefix: bytes, reader: io.BufferedReader):
-        # keep a memoryview so we can slice off bytes without copying on each read
-        self._prefix = memoryview(prefix)
-        self._reader = reader
-
-    def readable(self):
-        return True
-
-    def readinto(self, b: bytearray) -> int:
-        # chatgpt wrote this code, idfk
-        size = len(b)
-        buf = bytearray()
-
-        # 1) Serve from prefix if any remains
-        if self._prefix is not None:
-            if len(self._prefix) <= size:
-                buf += self._prefix.tobytes()
-                remaining = size - len(self._prefix)
-                self._prefix = None
-                if remaining:
-                    chunk = self._reader.read(remaining)
-                    if chunk:
-                        buf += chunk
-            else:
-                buf += self._prefix[:size].tobytes()
-                self._prefix = self._prefix[size:]
-        else:
-            # 2) No prefix left → drain straight from the reader
-            chunk = self._reader.read(size)
-            if chunk:
-                buf += chunk
-
-        # copy into the supplied buffer and report how many bytes we wrote
-        b_view = memoryview(b)
-        b_view[:len(buf)] = buf
-        return len(buf)
-
-
-def urlopen(url, *args, **kwargs):
-    method = "GET"
-    data = None
+def _to_request(url, data=None) -> Request:
+    # same as OpenerDirector.open, a data argument turns a GET into a POST, or replaces a Request's data
+    method = "GET" if data is None else "POST"
     headers = {}
     if isinstance(url, urllib.request.Request):
-        current_jar.add_cookie_header(url)
+        if data is not None:
+            url.data = data
+        # the jar only exists once a (patched) HTTPCookieProcessor has been made
+        if current_jar is not None:
+            current_jar.add_cookie_header(url)
         method = url.get_method()
         data = url.data
         headers = dict(url.header_items())
         url = url.full_url
 
-    request = Request(method, url, headers=headers, body=data)
-    resp = send(request)
-    from js import console
-    from pyodide.ffi import to_js
+    return Request(method, url, headers=headers, body=data)
+
+
+def _to_response(resp, url: str) -> HTTPResponse:
     # print(resp)
 
     # Build a fake http response
@@ -100,46 +64,20 @@ def urlopen(url, *args, **kwargs):
     to decode nonsense. super simple fix, we just remove the transfer-encoding header, and it behaves like normal
     bytes, and thats fine
     """
-    headers_without_content_length = {
-        k: v for k, v in resp.headers.items() if k.lower() not in ["content-length", "transfer-encoding"]
-    }
+    headers_without_content_length = resp.headers
+    del headers_without_content_length["content-length"]
+    del headers_without_content_length["transfer-encoding"]
 
     if resp.stream:
-        response_header = (
-                b"HTTP/1.1 "
-                + str(resp.status_code).encode("ascii")
-                + b"\n"
-                + "\n".join(
-            f"{key}: {value}" for key, value in headers_without_content_length.items()
-        ).encode("ascii")
-                + b"\n\n"
+        # the streamed body is read as-is, with no length known up front
+        response = _prebuilt_response(
+            FakeSock(resp.body), resp.status_code, headers_without_content_length, None
         )
-
-        # wrap streaming array in fake socket
-        response = HTTPResponse(StreamSock(response_header, resp.body))
-        response.url = url
-        response.begin()
     else:
-        response_data = (
-                b"HTTP/1.1 "
-                + str(resp.status_code).encode("ascii")
-                + b"\n"
-                + "\n".join(
-            f"{key}: {value}" for key, value in headers_without_content_length.items()
-        ).encode("ascii")
-                + b"\n\n"
-                + resp.body
+        response = _prebuilt_response(
+            FakeSock(BytesIO(resp.body)), resp.status_code, headers_without_content_length, len(resp.body)
         )
-        # print("PROXY:", response_data.decode())
-        response = HTTPResponse(FakeSock(response_data))
-        response.url = url
-        response.begin()
-
-    # patch
-    if isinstance(url, urllib.request.Request):
-        response.url = url.full_url
-    else:
-        response.url = url
+    response.url = url
 
     # urlopen actually throws an exception on http errors. i dont think yt-dlp cares, but this is "proper"
     # wrote this as i was chasing down a different bug, but i think its more proper so it stays
@@ -149,6 +87,18 @@ def urlopen(url, *args, **kwargs):
     return response
 
 
+def urlopen(url, data=None, *args, **kwargs):
+    request = _to_request(url, data)
+    full_url = request.url
+    return _to_response(send(request), full_url)
+
+
+async def urlopen_async(url, data=None):
+    request = _to_request(url, data)
+    full_url = request.url
+    return _to_response(await send_async(request), full_url)
+
+
 def urlopen_self_removed(self, url, *args, **kwargs):
     return urlopen(url, *args, **kwargs)
 
@@ -177,4 +127,14 @@ def patch():
     urllib.request.urlopen = urlopen
     urllib.request.OpenerDirector.open = urlopen_self_removed
 
+    # openers made from now on get urlopen itself as an instance attribute, so opener.open(...) is a plain
+    # function call, without binding a method and going through urlopen_self_removed every time
+    urllib.request.OpenerDirector._old_init = urllib.request.OpenerDirector.__init__
+
+    def new_init(self, *args, **kwargs):
+        self._old_init(*args, **kwargs)
+        self.open = urlopen
+
+    urllib.request.OpenerDirector.__init__ = new_init
+
     _IS_PATCHED = True
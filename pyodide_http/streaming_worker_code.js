@@ -22,6 +22,10 @@ self.addEventListener("message", async function (event) {
             try
             {
                 let readResponse = await reader.read();
+                if (!(connectionID in connections)) {
+                    // closed while we were reading ahead, nobody wants this chunk
+                    return;
+                }
 
                 if (readResponse.done) {
                     // read everything - clear connection and return
@@ -84,6 +84,38 @@ def test_credentials_option(selenium_standalone, dist_dir, web_server_base):
         assert not ph._options.with_credentials
 
 
+def test_stream_buffer_size_option(selenium_standalone, dist_dir, web_server_base):
+    _install_package(selenium_standalone, web_server_base)
+
+    @run_in_pyodide
+    def test_fn(selenium_standalone, base_url):
+        import pyodide_http as ph
+
+        default = ph._options.stream_buffer_size
+        assert default % 65536 == 0
+
+        for bad in (0, -65536, 65536 + 1, 100000):
+            try:
+                ph.set_stream_buffer_size_option(bad)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"{bad} was accepted as a stream buffer size")
+            assert ph._options.stream_buffer_size == default
+
+        ph.set_stream_buffer_size_option(2 * 65536)
+        assert ph._options.stream_buffer_size == 2 * 65536
+
+        # the context keeps the current size, and changes inside it don't leak out
+        with ph.option_context():
+            assert ph._options.stream_buffer_size == 2 * 65536
+            ph.set_stream_buffer_size_option(65536)
+            assert ph._options.stream_buffer_size == 65536
+        assert ph._options.stream_buffer_size == 2 * 65536
+
+        ph.set_stream_buffer_size_option(default)
+
+
 def test_requests_get(selenium_standalone, dist_dir, web_server_base):
     _install_package(selenium_standalone, web_server_base)
 
@@ -139,6 +171,91 @@ def test_urllib_get(selenium_standalone, dist_dir, web_server_base):
     assert test_fn(selenium_standalone, f"{web_server_base}{dist_dir}/") == 78336150
 
 
+def test_urllib_response_fields(selenium_standalone, dist_dir, web_server_base):
+    _install_package(selenium_standalone, web_server_base)
+
+    @run_in_pyodide
+    def test_fn(selenium_standalone, base_url):
+        import urllib.request
+
+        url = f"{base_url}/yt-4.1.4-cp311-cp311-emscripten_3_1_46_wasm32.whl"
+        with urllib.request.urlopen(url) as resp:
+            assert resp.status == 200
+            assert resp.reason == "OK"
+            assert resp.headers["Content-Type"] is not None
+            assert resp.getheader("content-type") == resp.headers["content-type"]
+            # the body is handed over already decoded, so these must not reach http.client
+            assert resp.headers["Content-Length"] is None
+            assert resp.getheader("transfer-encoding") is None
+            return len(resp.read())
+
+    assert test_fn(selenium_standalone, f"{web_server_base}{dist_dir}/") == 78336150
+
+
+def test_urllib_404(selenium_standalone, dist_dir, web_server_base):
+    _install_package(selenium_standalone, web_server_base)
+
+    @run_in_pyodide
+    def test_fn(selenium_standalone, base_url):
+        import urllib.error
+        import urllib.request
+
+        try:
+            urllib.request.urlopen(f"{base_url}/surely_this_file_does_not_exist.hopefully.")
+        except urllib.error.HTTPError as e:
+            assert e.headers is not None
+            assert e.headers["Content-Type"] is not None
+            return e.code
+        return None
+
+    assert test_fn(selenium_standalone, f"{web_server_base}{dist_dir}/") == 404
+
+
+def test_urlopen_async(selenium_standalone, dist_dir, web_server_base):
+    _install_package(selenium_standalone, web_server_base)
+
+    @run_in_pyodide
+    async def test_fn(selenium_standalone, base_url):
+        import asyncio
+
+        import pyodide_http as ph
+
+        print("get:", base_url)
+        url = f"{base_url}/yt-4.1.4-cp311-cp311-emscripten_3_1_46_wasm32.whl"
+        responses = await asyncio.gather(ph.urlopen_async(url), ph.urlopen_async(url))
+        for resp in responses:
+            assert resp.url == url
+
+        return [len(resp.read()) for resp in responses]
+
+    assert test_fn(selenium_standalone, f"{web_server_base}{dist_dir}/") == [78336150, 78336150]
+
+
+def test_urlopen_async_request_and_data(selenium_standalone, dist_dir, web_server_base):
+    _install_package(selenium_standalone, web_server_base)
+
+    @run_in_pyodide
+    async def test_fn(selenium_standalone, base_url):
+        import urllib.error
+        import urllib.request
+
+        import pyodide_http as ph
+
+        url = f"{base_url}/yt-4.1.4-cp311-cp311-emscripten_3_1_46_wasm32.whl"
+        # a Request works without a cookie processor having been created first
+        resp = await ph.urlopen_async(urllib.request.Request(url))
+        assert resp.status == 200
+
+        # data turns it into a POST, which the test server doesn't implement
+        try:
+            await ph.urlopen_async(url, data=b"some data")
+        except urllib.error.HTTPError as e:
+            return e.code
+        return None
+
+    assert test_fn(selenium_standalone, f"{web_server_base}{dist_dir}/") == 501
+
+
 def test_requests_404(selenium_standalone, dist_dir, web_server_base):
     _install_package(selenium_standalone, web_server_base)
 
@@ -226,6 +226,118 @@ data_len
     assert resp == big_file_path[1]
 
 
+def test_stream_buffer_size_worker(selenium_standalone, web_server_dist, big_file_path):
+    test_filename, test_size = big_file_path
+    fetch_url = f"{web_server_dist}{test_filename}"
+    resp = selenium_standalone.run_webworker(
+        get_install_package_code(web_server_dist)
+        + f"""
+import js
+import requests
+import pyodide_http as ph
+
+sizes = []
+ph.set_stream_buffer_size_option(2 * 65536)
+resp = requests.get('{fetch_url}', stream=True)
+if js.crossOriginIsolated:
+    sizes.append(resp.raw.raw.byte_buffer.buffer.byteLength)
+resp.close()
+
+# a size set inside option_context has to reach the worker too
+with ph.option_context():
+    ph.set_stream_buffer_size_option(65536)
+    resp = requests.get('{fetch_url}', stream=True)
+    if js.crossOriginIsolated:
+        sizes.append(resp.raw.raw.byte_buffer.buffer.byteLength)
+    data_len = len(resp.content)
+[data_len, sizes, js.crossOriginIsolated]
+        """
+    )
+
+    data_len, sizes, isolated = resp
+    assert data_len == test_size
+    if isolated:
+        assert sizes == [2 * 65536, 65536]
+
+
+def test_requests_stream_post_body_worker(selenium_standalone, web_server_dist, dist_dir):
+    fetch_url = f"{web_server_dist}{dist_dir}/"
+    resp = selenium_standalone.run_webworker(
+        get_install_package_code(web_server_dist)
+        + f"""
+import array
+import requests
+statuses = []
+# the test server doesn't implement POST, getting its 501 back means the body made it through the fetch worker
+resp = requests.post('{fetch_url}', data=b"some bytes", stream=True)
+statuses.append(resp.status_code)
+resp.close()
+# items wider than a byte, the transferred buffer has to be sized in bytes
+resp = requests.post('{fetch_url}', data=memoryview(array.array("i", [1, 2, 3])), stream=True)
+statuses.append(resp.status_code)
+resp.close()
+statuses
+        """
+    )
+
+    assert resp == [501, 501]
+
+
+def test_urllib_stream_worker(selenium_standalone, web_server_dist, big_file_path):
+    test_filename, test_size = big_file_path
+    fetch_url = f"{web_server_dist}{test_filename}"
+    resp = selenium_standalone.run_webworker(
+        get_install_package_code(web_server_dist)
+        + f"""
+import js
+import urllib.request
+resp=urllib.request.urlopen('{fetch_url}')
+assert resp.status == 200
+assert resp.reason == "OK"
+assert resp.headers["X-MyLovelyHeader"] == "123"
+assert resp.getheader("x-mylovelyheader") == "123"
+# the body is handed over already decoded, so these must not reach http.client
+assert resp.headers["Content-Length"] is None
+assert resp.getheader("transfer-encoding") is None
+data_len=0
+data_count=0
+
+while True:
+    this_len=len(resp.read(65536))
+    data_len+=this_len
+    if this_len==0:
+        break
+    data_count+=1
+if js.crossOriginIsolated:
+    # check streaming is really happening
+    assert (data_count>1)
+data_len
+        """
+    )
+
+    assert resp == test_size
+
+
+def test_urllib_404_worker(selenium_standalone, web_server_dist, dist_dir):
+    fetch_url = f"{web_server_dist}{dist_dir}/surely_this_file_does_not_exist.hopefully."
+    resp = selenium_standalone.run_webworker(
+        get_install_package_code(web_server_dist)
+        + f"""
+import urllib.error
+import urllib.request
+code = None
+try:
+    urllib.request.urlopen('{fetch_url}')
+except urllib.error.HTTPError as e:
+    assert e.headers["X-MyLovelyHeader"] == "123"
+    code = e.code
+code
+        """
+    )
+
+    assert resp == 404
+
+
 def test_requests_404(selenium_standalone, dist_dir, web_server_dist):
     _install_package(selenium_standalone, web_server_dist)
 